@@ -1,10 +1,14 @@
 import pickle
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 from groq import Groq
 import os
+import sys
 from dotenv import load_dotenv
 import json
+import re
+from collections import OrderedDict
 
 # Load environment variables
 load_dotenv()
@@ -13,32 +17,236 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found. Add it to your .env file.")
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    # Explicit signature compiles at import time (and is cached on disk), so the
+    # first query doesn't pay the JIT cost
+    @njit('float32[::1](float32[:, ::1], float32[::1], float32[::1], float32[::1])',
+          parallel=True, fastmath=True, cache=True)
+    def similarity_with_boost(matrix, query, boost, out):
+        """Fused dot product + mood boost for every row, written into out."""
+        for i in prange(matrix.shape[0]):
+            s = np.float32(0.0)
+            for k in range(matrix.shape[1]):
+                s += matrix[i, k] * query[k]
+            out[i] = s + boost[i]
+        return out
+else:
+    similarity_with_boost = None
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+class OnnxSentenceEncoder:
+    """
+    Mean-pooling sentence encoder backed by an (int8-quantized) ONNX model.
+    
+    Drop-in replacement for SentenceTransformer.encode on CPU. To build the model:
+    
+        optimum-cli export onnx --model sentence-transformers/all-mpnet-base-v2 \
+            --task feature-extraction mpnet_onnx/
+        python -c "from onnxruntime.quantization import quantize_dynamic, QuantType; \
+            quantize_dynamic('mpnet_onnx/model.onnx', 'mpnet_onnx/model_int8.onnx', weight_type=QuantType.QInt8)"
+    
+    The tokenizer is loaded from the same folder as the model.
+    """
+    
+    def __init__(self, model_path, max_length=384):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(model_path) or '.')
+        self.session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_names = [inp.name for inp in self.session.get_inputs()]
+        self.max_length = max_length
+    
+    def encode(self, sentences, normalize_embeddings=False):
+        """Encode one sentence (returns 1-D) or a list of sentences (returns 2-D)."""
+        single = isinstance(sentences, str)
+        batch = [sentences] if single else list(sentences)
+        
+        encoded = self.tokenizer(batch, padding=True, truncation=True,
+                                 max_length=self.max_length, return_tensors='np')
+        feeds = {name: encoded[name] for name in self.input_names if name in encoded}
+        token_embeddings = self.session.run(None, feeds)[0]
+        
+        # Mean pooling over real (non-padding) tokens
+        mask = encoded['attention_mask'][..., None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        embeddings = embeddings.astype(np.float32)
+        
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        
+        return embeddings[0] if single else embeddings
+
+
+MOOD_PROMPTS = {
+    'sad': """You are a warm, empathetic restaurant assistant. The customer is feeling down, so be extra caring and supportive. 
+Recommend comfort foods that might lift their spirits. Use a gentle, understanding tone.""",
+
+    'happy': """You are an enthusiastic and upbeat restaurant assistant. The customer is in a great mood! 
+Match their energy with cheerful recommendations. Suggest fresh, vibrant dishes.""",
+
+    'excited': """You are an energetic restaurant assistant. The customer is excited and looking for something special! 
+Recommend bold, flavorful, or adventurous dishes. Be enthusiastic about your suggestions.""",
+
+    'celebration': """You are a celebratory restaurant assistant. The customer is celebrating something special! 
+Recommend premium, indulgent items perfect for the occasion. Make them feel special.""",
+
+    'stressed': """You are a calming, reassuring restaurant assistant. The customer seems stressed. 
+Recommend soothing, simple, familiar foods. Use a calm and reassuring tone.""",
+
+    'tired': """You are an understanding restaurant assistant. The customer seems tired and needs energy. 
+Recommend energizing, nutritious options. Be supportive and helpful.""",
+
+    'romantic': """You are a sophisticated restaurant assistant. The customer is planning something romantic. 
+Recommend elegant dishes perfect for sharing or special occasions. Be thoughtful and refined.""",
+
+    'nostalgic': """You are a warm restaurant assistant. The customer is feeling nostalgic. 
+Recommend traditional, homestyle, classic dishes. Connect with their memories."""
+}
+
+BASE_SYSTEM_PROMPT = """You are a friendly and helpful restaurant menu assistant. Your role is to help customers find items from the menu and answer their questions.
+
+IMPORTANT RULES:
+1. ONLY recommend items that are in the provided menu context below
+2. DO NOT make up or suggest items that are not in the menu
+3. If asked about something not in the menu, politely say it's not available
+4. Be conversational, warm, and helpful
+5. If asked about prices, ingredients, or details, provide accurate information from the menu
+6. ALL PRICES ARE IN INR (Indian Rupees). Always mention prices as "₹X" or "Rs. X" or "INR X"
+7. If the customer's question is unclear, ask for clarification
+8. Make recommendations based on what's actually available in the menu
+9. Keep responses concise but friendly"""
+
+
+def find_terms(texts, terms):
+    """
+    Find which terms occur in each text.
+    
+    Uses the fastest available matcher: a Hyperscan database (SIMD
+    multi-literal search), then a pyahocorasick automaton (one pass per
+    text), then a plain substring check per term.
+    
+    Args:
+        texts: Texts to scan
+        terms: Unique terms to look for
+    
+    Returns:
+        List with one set of matched term indices per text
+    """
+    if not terms:
+        return [set() for _ in texts]
+    
+    if hyperscan is not None:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=[re.escape(term).encode('utf-8') for term in terms],
+            ids=list(range(len(terms))),
+            elements=len(terms),
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(terms)
+        )
+        
+        results = []
+        for text in texts:
+            matched = set()
+            database.scan(text.encode('utf-8'),
+                          match_event_handler=lambda term_id, start, end, flags, context: matched.add(term_id))
+            results.append(matched)
+        return results
+    
+    if ahocorasick is None:
+        return [{i for i, term in enumerate(terms) if term in text} for text in texts]
+    
+    automaton = ahocorasick.Automaton()
+    for i, term in enumerate(terms):
+        automaton.add_word(term, i)
+    automaton.make_automaton()
+    
+    return [{i for _, i in automaton.iter(text)} for text in texts]
+
 
 class MoodBasedMenuChatbot:
-    def __init__(self, embeddings_path, model_name='sentence-transformers/all-mpnet-base-v2'):
+    def __init__(self, embeddings_path, model_name='sentence-transformers/all-mpnet-base-v2',
+                 onnx_model_path=None):
         """
         Initialize the mood-based menu chatbot with embeddings and models.
         
         Args:
-            embeddings_path: Path to the pickle file containing embeddings
+            embeddings_path: Path to the embeddings file, either a pickle or a
+                float16 .npy matrix from convert_embeddings.py
             model_name: Sentence transformer model for encoding queries
+            onnx_model_path: Optional quantized ONNX export of the same model
+                (defaults to the ENCODER_ONNX_PATH environment variable)
         """
         print("Loading menu embeddings...")
-        with open(embeddings_path, 'rb') as f:
-            data = pickle.load(f)
-            self.embeddings = data['embeddings']
-            self.metadata = data['metadata']
-        
-        print(f"Loaded {len(self.embeddings)} menu items")
-        
-        print(f"Loading embedding model on CPU: {model_name}")
-        self.encoder = SentenceTransformer(model_name, device="cpu")
+        if embeddings_path.endswith('.npy'):
+            # Pre-normalized float16 matrix; memory-mapped so the OS pages in
+            # rows on demand instead of loading the whole menu up front
+            self.emb_matrix = np.load(embeddings_path, mmap_mode='r')
+            meta_path = embeddings_path[:-len('.npy')] + '_meta.json'
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.metadata = json.load(f)
+        else:
+            with open(embeddings_path, 'rb') as f:
+                data = pickle.load(f)
+                self.metadata = data['metadata']
+            
+            # Stack all embeddings into one L2-normalized float32 matrix so that
+            # cosine similarity against the whole menu is a single mat-vec product
+            self.emb_matrix = np.ascontiguousarray(np.stack(data['embeddings']), dtype=np.float32)
+            norms = np.linalg.norm(self.emb_matrix, axis=1, keepdims=True)
+            self.emb_matrix /= np.maximum(norms, 1e-12)
+        
+        print(f"Loaded {len(self.metadata)} menu items")
+        
+        onnx_model_path = onnx_model_path or os.getenv("ENCODER_ONNX_PATH")
+        if onnx_model_path:
+            print(f"Loading ONNX embedding model: {onnx_model_path}")
+            self.encoder = OnnxSentenceEncoder(onnx_model_path)
+        else:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"Loading embedding model on {device.upper()}: {model_name}")
+            self.encoder = SentenceTransformer(model_name, device=device)
+        
+        # LRU cache of normalized query embeddings (repeat turns skip the encoder)
+        self.query_cache = OrderedDict()
+        self.query_cache_size = 512
         
         print("Initializing Groq client...")
         self.groq_client = Groq(api_key=GROQ_API_KEY)
         
-        # Conversation history
+        # Conversation history, trimmed to a token budget rather than a message count
         self.conversation_history = []
+        self.history_token_counts = []
+        self.history_token_budget = 2048
+        
+        # Without tiktoken, fall back to a rough character-based estimate
+        self.tokenizer = None
+        if tiktoken is not None:
+            try:
+                self.tokenizer = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                # The encoding is downloaded on first use, which fails offline
+                pass
         
         # Current detected mood
         self.current_mood = None
@@ -55,62 +263,93 @@ class MoodBasedMenuChatbot:
             'nostalgic': ['traditional', 'classic', 'homestyle', 'authentic', 'comfort']
         }
         
+        # System prompts for every mood, built once (the prefix is identical across
+        # turns, so it also benefits from provider-side prompt caching)
+        self.system_prompts = {mood: prompt + "\n\n" + BASE_SYSTEM_PROMPT
+                               for mood, prompt in MOOD_PROMPTS.items()}
+        self.system_prompts[None] = BASE_SYSTEM_PROMPT
+        
+        # Mood descriptions used as prototypes for local mood classification
+        self.mood_descriptions = {
+            'sad': 'feeling sad, down, upset, lonely, heartbroken',
+            'happy': 'feeling happy, cheerful, content, joyful, in a good mood',
+            'excited': 'feeling excited, energetic, enthusiastic, pumped',
+            'celebration': 'celebrating a birthday, anniversary, achievement or party',
+            'stressed': 'feeling stressed, anxious, overwhelmed, worried',
+            'tired': 'feeling tired, exhausted, drained, sleepy',
+            'romantic': 'planning a romantic date night or romantic dinner',
+            'nostalgic': 'feeling nostalgic, missing home, childhood memories',
+            'neutral': 'asking about the menu, food, prices or ingredients'
+        }
+        self.mood_names = list(self.mood_descriptions)
+        self.mood_prototypes = np.asarray(
+            self.encoder.encode(list(self.mood_descriptions.values()), normalize_embeddings=True),
+            dtype=np.float32
+        )
+        self.mood_threshold = 0.35
+        
+        # Per-mood similarity boosts, computed once instead of on every query
+        self.mood_boosts = self.compute_mood_boosts()
+        self.no_boost = np.zeros(len(self.metadata), dtype=np.float32)
+        
+        # Output buffer for the fused numba kernel, reused across queries
+        self.similarity_buffer = np.empty(len(self.metadata), dtype=np.float32)
+        
         print("Chatbot ready!\n")
     
-    def detect_mood(self, user_query):
+    def compute_mood_boosts(self):
+        """
+        Precompute the mood boost for every menu item.
+        
+        Returns:
+            Dict mapping each mood to a float32 array with one boost per item
+        """
+        item_texts = [json.dumps(meta).lower() for meta in self.metadata]
+        
+        # Match every mood keyword against every item in one pass
+        terms = sorted({term.lower() for terms in self.mood_preferences.values() for term in terms})
+        term_index = {term: i for i, term in enumerate(terms)}
+        
+        term_hits = np.zeros((len(item_texts), len(terms)), dtype=np.float32)
+        for row, matched in enumerate(find_terms(item_texts, terms)):
+            term_hits[row, list(matched)] = 1
+        
+        mood_boosts = {}
+        for mood, mood_terms in self.mood_preferences.items():
+            # Count how many of the mood keywords appear in each item
+            columns = [term_index[term.lower()] for term in mood_terms]
+            match_counts = term_hits[:, columns].sum(axis=1)
+            
+            # Boost up to 10% increase
+            mood_boosts[mood] = np.minimum(0.1, match_counts * 0.02)
+        
+        return mood_boosts
+    
+    def detect_mood(self, user_query, query_embedding=None):
         """
         Detect the user's mood from their message.
         
+        Classifies locally by comparing the query embedding with the mood
+        prototypes, so no LLM round-trip is needed.
+        
         Args:
             user_query: User's message
+            query_embedding: Precomputed normalized embedding of the message (optional)
         
         Returns:
             Detected mood as string or None
         """
-        try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are a mood detection expert. Analyze the user's message and detect their emotional state.
-
-Respond with ONLY ONE WORD from this list:
-- sad (feeling down, upset, lonely, heartbroken)
-- happy (cheerful, content, joyful, good mood)
-- excited (energetic, enthusiastic, pumped)
-- celebration (birthday, anniversary, achievement, party)
-- stressed (anxious, overwhelmed, worried)
-- tired (exhausted, drained, sleepy)
-- romantic (date night, romantic dinner)
-- nostalgic (missing home, childhood memories)
-- neutral (no specific mood detected)
-
-RESPOND WITH ONLY THE MOOD WORD, NOTHING ELSE."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Detect the mood from this message: '{user_query}'"
-                }
-            ]
-            
-            completion = self.groq_client.chat.completions.create(
-                model="meta-llama/llama-4-maverick-17b-128e-instruct",
-                messages=messages,
-                temperature=0.3,
-                max_tokens=10
-            )
-            
-            mood = completion.choices[0].message.content.strip().lower()
-            
-            # Validate mood
-            valid_moods = list(self.mood_preferences.keys()) + ['neutral']
-            if mood in valid_moods and mood != 'neutral':
-                return mood
-            
-            return None
+        if query_embedding is None:
+            query_embedding = self.encode_query(user_query)
         
-        except Exception as e:
-            print(f"Mood detection error: {e}")
-            return None
+        scores = self.mood_prototypes @ query_embedding
+        best = int(scores.argmax())
+        mood = self.mood_names[best]
+        
+        if mood != 'neutral' and scores[best] > self.mood_threshold:
+            return mood
+        
+        return None
     
     def enhance_query_with_mood(self, query, mood):
         """
@@ -128,11 +367,64 @@ RESPOND WITH ONLY THE MOOD WORD, NOTHING ELSE."""
             return f"{query} {mood_terms}"
         return query
     
-    def cosine_similarity(self, a, b):
-        """Calculate cosine similarity between two vectors."""
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    def encode_query(self, text):
+        """
+        Encode a query into an L2-normalized float32 vector, with LRU caching.
+        
+        Args:
+            text: Query text to encode
+        
+        Returns:
+            Read-only normalized query embedding
+        """
+        if text in self.query_cache:
+            self.query_cache.move_to_end(text)
+            return self.query_cache[text]
+        
+        embedding = self.encoder.encode(text).astype(np.float32)
+        embedding /= max(np.linalg.norm(embedding), 1e-12)
+        embedding.setflags(write=False)
+        
+        self.query_cache[text] = embedding
+        while len(self.query_cache) > self.query_cache_size:
+            self.query_cache.popitem(last=False)
+        
+        return embedding
+    
+    def compute_similarities(self, query_embedding, boost=None, tile_rows=4096):
+        """
+        Cosine similarity of a normalized query against every menu item, plus an optional boost.
+        
+        A float32 matrix goes through the fused numba kernel when numba is
+        installed (the result then lives in a buffer reused by the next call).
+        Otherwise the matrix is processed in tiles so a float16 matrix is only
+        upcast to float32 a few thousand rows at a time.
+        
+        Args:
+            query_embedding: L2-normalized float32 query vector
+            boost: Optional float32 array with one score boost per item
+            tile_rows: Rows of the embedding matrix per tile
+        
+        Returns:
+            float32 array with one score per menu item
+        """
+        if boost is None:
+            boost = self.no_boost
+        
+        if (similarity_with_boost is not None and self.emb_matrix.dtype == np.float32
+                and self.emb_matrix.flags.c_contiguous):
+            return similarity_with_boost(self.emb_matrix, np.array(query_embedding, dtype=np.float32),
+                                         boost, self.similarity_buffer)
+        
+        num_items = self.emb_matrix.shape[0]
+        similarities = np.empty(num_items, dtype=np.float32)
+        for start in range(0, num_items, tile_rows):
+            tile = np.asarray(self.emb_matrix[start:start + tile_rows], dtype=np.float32)
+            similarities[start:start + tile_rows] = tile @ query_embedding
+        similarities += boost
+        return similarities
     
-    def search_menu(self, query, mood=None, top_k=7):
+    def search_menu(self, query, mood=None, top_k=7, query_embedding=None):
         """
         Search for relevant menu items based on query and mood.
         
@@ -140,49 +432,78 @@ RESPOND WITH ONLY THE MOOD WORD, NOTHING ELSE."""
             query: User's search query
             mood: User's mood (optional)
             top_k: Number of top results to return
+            query_embedding: Precomputed normalized embedding of the query
+                (optional; skips encoding and mood-term query enhancement)
         
         Returns:
             List of relevant menu items with metadata
         """
-        # Enhance query with mood preferences
-        enhanced_query = self.enhance_query_with_mood(query, mood)
+        if query_embedding is None:
+            # Enhance query with mood preferences
+            enhanced_query = self.enhance_query_with_mood(query, mood)
+            
+            # Encode the query (cached across turns)
+            query_embedding = self.encode_query(enhanced_query)
         
-        # Encode the query
-        query_embedding = self.encoder.encode(enhanced_query)
+        # Cosine similarity against every menu item, boosted if it matches mood preferences
+        similarities = self.compute_similarities(query_embedding, self.mood_boosts.get(mood))
         
-        # Calculate similarities
-        similarities = []
-        for idx, embedding in enumerate(self.embeddings):
-            sim = self.cosine_similarity(query_embedding, embedding)
-            
-            # Boost score if item matches mood preferences
-            if mood and mood in self.mood_preferences:
-                meta = self.metadata[idx]
-                item_text = json.dumps(meta).lower()
-                
-                # Check if item description matches mood keywords
-                mood_match_count = sum(1 for term in self.mood_preferences[mood] 
-                                      if term.lower() in item_text)
-                
-                # Apply boost (up to 10% increase)
-                mood_boost = min(0.1, mood_match_count * 0.02)
-                sim += mood_boost
-            
-            similarities.append((idx, sim))
+        return self.select_top_k(similarities, top_k)
+    
+    def select_top_k(self, similarities, top_k=7):
+        """
+        Pick the highest-scoring menu items.
         
-        # Sort by similarity (highest first)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        Args:
+            similarities: Array with one score per menu item
+            top_k: Number of top results to return
+        
+        Returns:
+            List of menu items with metadata, best first
+        """
+        # Partially select the top k in O(N), then sort only those
+        top_k = min(top_k, len(similarities))
+        if top_k < len(similarities):
+            top_indices = np.argpartition(-similarities, top_k)[:top_k]
+        else:
+            top_indices = np.arange(len(similarities))
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
         
-        # Get top k results
         results = []
-        for idx, sim in similarities[:top_k]:
+        for idx in top_indices:
             results.append({
                 'metadata': self.metadata[idx],
-                'similarity': float(sim)
+                'similarity': float(similarities[idx])
             })
         
         return results
     
+    def count_tokens(self, text):
+        """Count (or estimate, without tiktoken) the tokens in a message."""
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text))
+        return len(text) // 4 + 1
+    
+    def add_to_history(self, role, content):
+        """
+        Append a message to the conversation history, dropping the oldest
+        exchanges once the history exceeds its token budget.
+        
+        Args:
+            role: "user" or "assistant"
+            content: Message text
+        """
+        self.conversation_history.append({
+            "role": role,
+            "content": content
+        })
+        self.history_token_counts.append(self.count_tokens(content))
+        
+        # Drop whole user/assistant exchanges, but always keep the latest one
+        while sum(self.history_token_counts) > self.history_token_budget and len(self.conversation_history) > 2:
+            del self.conversation_history[:2]
+            del self.history_token_counts[:2]
+    
     def format_context(self, search_results):
         """Format search results into context for the LLM."""
         context_parts = []
@@ -227,53 +548,12 @@ RESPOND WITH ONLY THE MOOD WORD, NOTHING ELSE."""
         Returns:
             System prompt string
         """
-        mood_prompts = {
-            'sad': """You are a warm, empathetic restaurant assistant. The customer is feeling down, so be extra caring and supportive. 
-Recommend comfort foods that might lift their spirits. Use a gentle, understanding tone.""",
-            
-            'happy': """You are an enthusiastic and upbeat restaurant assistant. The customer is in a great mood! 
-Match their energy with cheerful recommendations. Suggest fresh, vibrant dishes.""",
-            
-            'excited': """You are an energetic restaurant assistant. The customer is excited and looking for something special! 
-Recommend bold, flavorful, or adventurous dishes. Be enthusiastic about your suggestions.""",
-            
-            'celebration': """You are a celebratory restaurant assistant. The customer is celebrating something special! 
-Recommend premium, indulgent items perfect for the occasion. Make them feel special.""",
-            
-            'stressed': """You are a calming, reassuring restaurant assistant. The customer seems stressed. 
-Recommend soothing, simple, familiar foods. Use a calm and reassuring tone.""",
-            
-            'tired': """You are an understanding restaurant assistant. The customer seems tired and needs energy. 
-Recommend energizing, nutritious options. Be supportive and helpful.""",
-            
-            'romantic': """You are a sophisticated restaurant assistant. The customer is planning something romantic. 
-Recommend elegant dishes perfect for sharing or special occasions. Be thoughtful and refined.""",
-            
-            'nostalgic': """You are a warm restaurant assistant. The customer is feeling nostalgic. 
-Recommend traditional, homestyle, classic dishes. Connect with their memories."""
-        }
-        
-        base_prompt = """You are a friendly and helpful restaurant menu assistant. Your role is to help customers find items from the menu and answer their questions.
-
-IMPORTANT RULES:
-1. ONLY recommend items that are in the provided menu context below
-2. DO NOT make up or suggest items that are not in the menu
-3. If asked about something not in the menu, politely say it's not available
-4. Be conversational, warm, and helpful
-5. If asked about prices, ingredients, or details, provide accurate information from the menu
-6. ALL PRICES ARE IN INR (Indian Rupees). Always mention prices as "₹X" or "Rs. X" or "INR X"
-7. If the customer's question is unclear, ask for clarification
-8. Make recommendations based on what's actually available in the menu
-9. Keep responses concise but friendly"""
-        
-        if mood and mood in mood_prompts:
-            return mood_prompts[mood] + "\n\n" + base_prompt
-        
-        return base_prompt
+        return self.system_prompts.get(mood, self.system_prompts[None])
     
     def generate_response(self, user_query, context, mood=None):
         """
         Generate conversational response using Groq API with mood awareness.
+        The reply is streamed to stdout as tokens arrive.
         
         Args:
             user_query: User's question
@@ -291,9 +571,8 @@ IMPORTANT RULES:
             }
         ]
         
-        # Add conversation history (last 6 messages for context)
-        for msg in self.conversation_history[-6:]:
-            messages.append(msg)
+        # Add conversation history (already trimmed to the token budget)
+        messages.extend(self.conversation_history)
         
         # Build user message with mood context
         user_content = f"""Customer question: {user_query}"""
@@ -321,25 +600,32 @@ Please answer the customer's question based ONLY on the menu items listed above.
                 model="meta-llama/llama-4-maverick-17b-128e-instruct",
                 messages=messages,
                 temperature=0.7,
-                max_tokens=1024
+                max_tokens=1024,
+                stream=True
             )
             
-            response = completion.choices[0].message.content.strip()
+            # Show tokens as they arrive instead of waiting for the full reply
+            response_parts = []
+            for chunk in completion:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    sys.stdout.write(delta)
+                    sys.stdout.flush()
+                    response_parts.append(delta)
+            
+            response = ''.join(response_parts).strip()
             
             # Update conversation history
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_query
-            })
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": response
-            })
+            self.add_to_history("user", user_query)
+            self.add_to_history("assistant", response)
             
             return response
         
         except Exception as e:
-            return f"I'm sorry, I encountered an error: {str(e)}"
+            error_message = f"I'm sorry, I encountered an error: {str(e)}"
+            sys.stdout.write(error_message)
+            sys.stdout.flush()
+            return error_message
     
     def chat(self, user_query):
         """
@@ -351,15 +637,19 @@ Please answer the customer's question based ONLY on the menu items listed above.
         Returns:
             AI response
         """
-        # Detect mood
-        detected_mood = self.detect_mood(user_query)
+        # One encoder pass feeds both mood detection and menu search
+        query_embedding = self.encode_query(user_query)
+        
+        # Detect mood locally
+        detected_mood = self.detect_mood(user_query, query_embedding)
         
         if detected_mood:
             self.current_mood = detected_mood
             print(f"[Detected mood: {detected_mood}]")
         
-        # Search for relevant menu items with mood enhancement
-        search_results = self.search_menu(user_query, mood=self.current_mood, top_k=7)
+        # Search for relevant menu items, boosting those that suit the mood
+        search_results = self.search_menu(user_query, mood=self.current_mood, top_k=7,
+                                          query_embedding=query_embedding)
         
         # Format context
         context = self.format_context(search_results)
@@ -372,14 +662,13 @@ Please answer the customer's question based ONLY on the menu items listed above.
     def reset_conversation(self):
         """Clear conversation history and mood."""
         self.conversation_history = []
+        self.history_token_counts = []
         self.current_mood = None
         print("Conversation history and mood cleared.")
 
 
 def main():
     """Interactive chatbot interface."""
-    import sys
-    
     # Check if embeddings file path is provided
     if len(sys.argv) < 2:
         embeddings_path = "menu_embeddings.pkl"
@@ -389,7 +678,7 @@ def main():
     
     if not os.path.exists(embeddings_path):
         print(f"Embeddings file not found: {embeddings_path}")
-        print("Please provide the correct path to your menu_embeddings.pkl file")
+        print("Please provide the correct path to your menu_embeddings.pkl (or .npy) file")
         exit(1)
     
     # Initialize chatbot
@@ -423,10 +712,10 @@ def main():
                 chatbot.reset_conversation()
                 continue
             
-            # Get response
+            # Get response (streamed to the terminal as it is generated)
             print("\nAssistant: ", end="", flush=True)
-            response = chatbot.chat(user_input)
-            print(response)
+            chatbot.chat(user_input)
+            print()
             print()
         
         except KeyboardInterrupt:
@@ -0,0 +1,45 @@
+import json
+import pickle
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+
+def convert_embeddings(pickle_path: str, output_path: str) -> Path:
+    """
+    Convert a pickled embeddings file into a float16 .npy matrix plus JSON metadata.
+    Rows are L2-normalized before the cast so the matrix can be memory-mapped
+    and used for cosine similarity directly.
+    """
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    matrix = np.stack(data['embeddings']).astype(np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    output_path = Path(output_path).with_suffix('.npy')
+    np.save(output_path, matrix.astype(np.float16))
+
+    meta_path = output_path.with_name(f"{output_path.stem}_meta.json")
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(data['metadata'], f, ensure_ascii=False)
+
+    print(f"Saved {matrix.shape[0]} x {matrix.shape[1]} float16 matrix to {output_path}")
+    print(f"Saved metadata to {meta_path}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert pickled menu embeddings to a memory-mappable .npy file')
+    parser.add_argument('input_pickle', help='Path to menu_embeddings.pkl')
+    parser.add_argument('output_file', nargs='?', default=None,
+                       help='Path to output .npy file (default: next to the input)')
+
+    args = parser.parse_args()
+    output_file = args.output_file or Path(args.input_pickle).with_suffix('.npy')
+    convert_embeddings(args.input_pickle, output_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -121,6 +121,16 @@ class MenuEmbeddingGenerator:
                      embeddings=self.embeddings,
                      metadata=np.array(self.metadata, dtype=object))
         
+        elif format == 'npy':
+            # float16 matrix the chatbot can memory-map, metadata alongside as JSON
+            # np.save appends .npy itself; set it here so the meta file name matches
+            output_path = output_path.with_suffix('.npy')
+            matrix = np.array(self.embeddings, dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            np.save(output_path, matrix.astype(np.float16))
+            with open(output_path.with_name(f"{output_path.stem}_meta.json"), 'w', encoding='utf-8') as f:
+                json.dump(self.metadata, f, ensure_ascii=False)
+        
         elif format == 'json':
             data = {
                 'embeddings': self.embeddings.tolist(),
@@ -142,7 +152,7 @@ def main():
     parser = argparse.ArgumentParser(description='Generate embeddings from restaurant menu JSON')
     parser.add_argument('input_json', help='Path to input menu JSON file')
     parser.add_argument('output_file', help='Path to output embeddings file')
-    parser.add_argument('--format', choices=['pickle', 'npz', 'json'],
+    parser.add_argument('--format', choices=['pickle', 'npz', 'npy', 'json'],
                        default='pickle', help='Output format (default: pickle)')
     parser.add_argument('--model', default="thenlper/gte-large",
                        help='Sentence transformer model (default: thenlper/gte-large)')
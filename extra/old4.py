@@ -1,10 +1,51 @@
+import asyncio
 import base64
+import hashlib
+import io
 import json
+import mimetypes
 import os
+import random
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
 from pathlib import Path
-from groq import Groq
+from groq import AsyncGroq, Groq, APIStatusError
 from dotenv import load_dotenv
  
+try:
+    import fitz  # PyMuPDF renders pages in-process, no poppler subprocess or PPM temp files
+except ImportError:
+    fitz = None
+ 
+try:
+    import orjson  # SIMD JSON parsing and serialization; stdlib json is the fallback
+except ImportError:
+    orjson = None
+ 
+try:
+    import json_repair  # Salvages truncated or malformed JSON in one pass
+except ImportError:
+    json_repair = None
+ 
+try:
+    import pybase64  # SIMD base64 that returns str directly
+except ImportError:
+    pybase64 = None
+ 
+try:
+    from aiolimiter import AsyncLimiter
+except ImportError:
+    AsyncLimiter = None
+ 
+try:
+    import xxhash  # Much faster than blake2b for spotting duplicate pages
+except ImportError:
+    xxhash = None
+ 
 # Load environment variables
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -12,39 +53,114 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found. Add it to your .env file.")
  
-def convert_pdf_to_image(pdf_path):
+MAX_WORKERS = 8  # Concurrent Groq requests (pages are independent)
+MAX_ATTEMPTS = 3  # Attempts per request on 429 / 5xx responses
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))  # Requests per minute allowed for MODEL_NAME on this account
+MODEL_NAME = "meta-llama/llama-4-maverick-17b-128e-instruct"
+TEMPERATURE = 0.1
+MAX_TOKENS = 8192  # Increased for complex pages
+# Pages sent together in one request; Groq accepts at most 5 images, and all
+# their JSON has to fit in MAX_TOKENS, so keep this small for dense menus
+PAGES_PER_REQUEST = max(1, min(int(os.getenv("PAGES_PER_REQUEST", "1")), 5))
+ 
+# Opt-in: submit all pages as one Groq batch job instead of per-page requests
+USE_GROQ_BATCH = os.getenv("USE_GROQ_BATCH", "false").lower() in ("1", "true", "yes")
+BATCH_POLL_SECONDS = 10
+ 
+BASE64_CHUNK_SIZE = 3 * 64 * 1024  # Multiple of 3 so chunks encode without padding
+ 
+# Markdown code fences the model sometimes wraps its JSON in
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+ 
+# Parsed Groq results, keyed on page bytes + prompt + model settings
+CACHE_DIR = Path(".cache/groq")
+ 
+# One async client shared by every page request
+client = AsyncGroq(api_key=GROQ_API_KEY)
+# Caps in-flight requests to stay under Groq's rate limits
+request_slots = asyncio.Semaphore(MAX_WORKERS)
+# Token bucket on request starts, so bursts never trip the per-minute limit (no-op without aiolimiter)
+rate_limiter = AsyncLimiter(GROQ_RPM, 60) if AsyncLimiter is not None else nullcontext()
+ 
+ 
+async def create_completion_with_retry(**kwargs):
+    """Call the Groq chat API, backing off exponentially (with jitter) on rate limits and server errors."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            async with rate_limiter, request_slots:
+                return await client.chat.completions.create(**kwargs)
+        except APIStatusError as e:
+            retryable = e.status_code == 429 or e.status_code >= 500
+            if not retryable or attempt == MAX_ATTEMPTS:
+                raise
+            # Jitter keeps pages that failed together from retrying in lockstep
+            delay = 2 ** attempt + random.uniform(0, 1)
+            print(f"⚠ Groq returned {e.status_code}, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+ 
+ 
+def _save_page(img, image_path, max_edge):
+    """Downscale and JPEG-encode one page to a path or file object."""
+    from PIL import Image
+    img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    img.save(image_path, 'JPEG', quality=85, optimize=True)
+    return image_path
+ 
+ 
+def convert_pdf_to_image(pdf_path, dpi=200, max_edge=1600):
+    """
+    Render each PDF page to a JPEG next to the PDF.
+ 
+    200 DPI capped at max_edge pixels is plenty for menu OCR and keeps the
+    base64 payload sent to Groq small.
+    """
     try:
-        from pdf2image import convert_from_path
         print("Converting PDF to images...")
-        images = convert_from_path(pdf_path, dpi=300)  # Removed page limits
- 
         pdf_dir = os.path.dirname(pdf_path) or "."
         pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-        
-        image_paths = []
-        for i, img in enumerate(images, 1):
-            image_path = os.path.join(pdf_dir, f"{pdf_name}_page{i}.png")
-            img.save(image_path, 'PNG')
-            image_paths.append(image_path)
+ 
+        if fitz is not None:
+            image_paths = [
+                os.path.join(pdf_dir, f"{pdf_name}_page{i}.jpg")
+                for i in range(1, pdf_page_count(pdf_path) + 1)
+            ]
+            # Pages are independent, so rasterize them on every core
+            with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(image_paths) or 1)) as executor:
+                pages = executor.map(
+                    render_pdf_page,
+                    repeat(pdf_path),
+                    range(1, len(image_paths) + 1),
+                    repeat(dpi),
+                    repeat(max_edge),
+                )
+                for image_path, image_bytes in zip(image_paths, pages):
+                    Path(image_path).write_bytes(image_bytes)
+        else:
+            from pdf2image import convert_from_path
+            # Let poppler render pages on all cores
+            images = convert_from_path(pdf_path, dpi=dpi, thread_count=os.cpu_count() or 1)  # Removed page limits
+ 
+            image_paths = [
+                os.path.join(pdf_dir, f"{pdf_name}_page{i}.jpg")
+                for i in range(1, len(images) + 1)
+            ]
+            # Pillow releases the GIL while resizing and encoding, so threads run pages
+            # in parallel without pickling full-resolution images to other processes
+            with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(images) or 1)) as executor:
+                image_paths = list(executor.map(_save_page, images, image_paths, repeat(max_edge)))
         
         print(f"Saved {len(image_paths)} page(s)")
         return image_paths
  
     except ImportError:
-        print("pdf2image not installed. Run: pip install pdf2image")
+        print("PyMuPDF or pdf2image not installed. Run: pip install pymupdf")
         return None
     except Exception as e:
         print(f"Error converting PDF: {e}")
         return None
  
  
-def extract_menu_to_json(file_path, groq_api_key):
-    client = Groq(api_key=groq_api_key)
- 
-    with open(file_path, "rb") as file:
-        file_data = base64.b64encode(file.read()).decode("utf-8")
- 
-    prompt = """Extract all menu items from this restaurant menu image and return ONLY a valid JSON object.
+MENU_PROMPT = """Extract all menu items from this restaurant menu image and return ONLY a valid JSON object.
  
 Structure the JSON like this:
 {
@@ -69,69 +185,450 @@ Rules:
 6. No explanations. Only JSON.
 """
  
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[
+MULTI_PAGE_PROMPT = """Extract all menu items from each of these restaurant menu page images and return ONLY a valid JSON array.
+ 
+The array must contain exactly one object per image, in the same order as the images:
+[
+  {
+    "restaurant_name": "string or null",
+    "phone": "string or null",
+    "categories": [
+      {
+        "category": "string",
+        "items": [
+          {"name": "string", "price": number}
+        ]
+      }
+    ]
+  }
+]
+ 
+Rules:
+1. Treat every image separately; never move items from one image's object to another.
+2. Extract all items with exact names and prices.
+3. Group items by category headers.
+4. If an item has multiple prices (different sizes, variants, or options), create separate entries for each.
+5. Include size/variant information in the item name to distinguish them.
+6. Prices must be numbers only (no strings like "180/190").
+7. If an image has no menu items, still include its object, with an empty "categories" list.
+8. No explanations. Only the JSON array.
+"""
+ 
+ 
+def guess_mime_type(file_path):
+    return mimetypes.guess_type(file_path)[0] or "image/png"
+ 
+ 
+def b64encode_str(data):
+    """Base64-encode bytes to an ASCII str, with pybase64 when it is installed."""
+    if pybase64 is not None:
+        return pybase64.b64encode_as_string(data)
+    return base64.b64encode(data).decode("ascii")
+ 
+ 
+def encode_image_data_url(file_path, mime_type):
+    """Base64-encode an image into a data URL chunk by chunk, never holding the whole raw file."""
+    buffer = io.StringIO()
+    buffer.write(f"data:{mime_type};base64,")
+    with open(file_path, "rb") as file:
+        while chunk := file.read(BASE64_CHUNK_SIZE):
+            buffer.write(b64encode_str(chunk))
+    return buffer.getvalue()
+ 
+ 
+def b64encode_bytes(data):
+    if pybase64 is not None:
+        return pybase64.b64encode(data)
+    return base64.b64encode(data)
+ 
+ 
+def write_batch_line(f, custom_id, file_path):
+    """
+    Write one batch JSONL line to a binary file, streaming the image's base64
+    straight into it as bytes. The data URL never exists as a str, so the
+    multi-MB payload is not decoded, copied into the JSON text and re-encoded.
+    """
+    placeholder = "__IMAGE_DATA_URL__"
+    head, tail = dumps_json(build_request(custom_id, placeholder)).split(placeholder.encode("ascii"), 1)
+    f.write(head)
+    f.write(f"data:{guess_mime_type(file_path)};base64,".encode("ascii"))
+    with open(file_path, "rb") as image:
+        while chunk := image.read(BASE64_CHUNK_SIZE):
+            f.write(b64encode_bytes(chunk))
+    f.write(tail + b"\n")
+ 
+ 
+def build_request(custom_id, *image_urls, prompt=MENU_PROMPT):
+    """Build the chat completion request for one or more menu pages, as a Groq batch JSONL line."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "messages": [
                 {
                     "role": "user",
                     "content": [
                         {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{file_data}"}
-                        }
+                        *(
+                            {
+                                "type": "image_url",
+                                "image_url": {"url": image_url}
+                            }
+                            for image_url in image_urls
+                        )
                     ]
                 }
             ],
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-            temperature=0.1,
-            max_tokens=8192  # Increased for complex pages
-        )
+            "model": MODEL_NAME,
+            "temperature": TEMPERATURE,
+            "max_tokens": MAX_TOKENS
+        }
+    }
  
-        response_text = chat_completion.choices[0].message.content.strip()
  
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        response_text = response_text.strip()
+def loads_json(text):
+    """Parse JSON text or bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+ 
+ 
+def dumps_json(data, indent=False):
+    """Serialize data to UTF-8 JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
  
-        menu_data = json.loads(response_text)
-        return menu_data
+ 
+def repair_menu_json(response_text):
+    """Salvage a malformed or truncated JSON object, returning None if nothing usable is left."""
+    if json_repair is not None:
+        # Single pass that handles trailing commas, unclosed brackets and cut-off strings
+        try:
+            menu_data = json_repair.loads(response_text)
+        except Exception:
+            return None
+        return menu_data if isinstance(menu_data, dict) else None
+ 
+    # Fallback: trim to the last complete object and close the remaining braces
+    try:
+        last_brace = response_text.rfind('}')
+        if last_brace > 0:
+            # Count in place up to the last brace (it closes one object itself),
+            # then build the candidate with a single concatenation
+            open_braces = response_text.count('{', 0, last_brace)
+            close_braces = response_text.count('}', 0, last_brace) + 1
+            return loads_json(response_text[:last_brace+1] + '}' * (open_braces - close_braces))
+    except json.JSONDecodeError:
+        pass
+    return None
+ 
+ 
+def parse_menu_response(response_text):
+    """Parse the model's reply into menu data, salvaging truncated JSON where possible."""
+    response_text = _FENCE_RE.sub("", response_text.strip()).strip()
+ 
+    try:
+        return loads_json(response_text)
  
     except json.JSONDecodeError as e:
         print(f"⚠ JSON Parse Error: {e}")
         print(f"⚠ Attempting to fix malformed JSON...")
         
-        # Try to salvage partial JSON
-        try:
-            # Find the last complete item and trim there
-            last_brace = response_text.rfind('}')
-            if last_brace > 0:
-                # Try to close the JSON properly
-                test_json = response_text[:last_brace+1]
-                # Count braces to properly close
-                open_braces = test_json.count('{')
-                close_braces = test_json.count('}')
-                test_json += '}' * (open_braces - close_braces)
-                
-                menu_data = json.loads(test_json)
-                print("✓ Successfully recovered partial data")
-                return menu_data
-        except:
-            pass
+        menu_data = repair_menu_json(response_text)
+        if menu_data:
+            print("✓ Successfully recovered partial data")
+            return menu_data
             
         print("✗ Could not recover data from this page")
         print("Raw Response (first 500 chars):")
         print(response_text[:500])
         return None
+ 
+ 
+def hash_file(file_path):
+    file_hash = hashlib.blake2b()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(BASE64_CHUNK_SIZE):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+ 
+ 
+def page_digest(image_bytes):
+    """Cheap in-process fingerprint of a rendered page, used to spot duplicate pages."""
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(image_bytes)
+    return hashlib.blake2b(image_bytes, digest_size=16).digest()
+ 
+ 
+def cache_key(content_hash, prompt=MENU_PROMPT):
+    """Cache key for a page: its content hash plus everything else that determines the model's answer."""
+    settings = f"{MODEL_NAME}\n{prompt}\n{TEMPERATURE}\n{MAX_TOKENS}".encode("utf-8")
+    return content_hash + "-" + hashlib.blake2b(settings).hexdigest()[:16]
+ 
+ 
+def page_cache_key(image_bytes, prompt=MENU_PROMPT):
+    return cache_key(hashlib.blake2b(image_bytes).hexdigest(), prompt)
+ 
+ 
+def read_cache(key):
+    """Return the cached result for key, or None if there is none."""
+    path = CACHE_DIR / key[:2] / key
+    if path.exists():
+        return loads_json(path.read_bytes())
+    return None
+ 
+ 
+def write_cache(key, result):
+    path = CACHE_DIR / key[:2] / key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so concurrent pages never see a half-written entry
+    with tempfile.NamedTemporaryFile("wb", dir=path.parent, delete=False) as f:
+        f.write(dumps_json(result))
+    os.replace(f.name, path)
+ 
+ 
+async def cached_call(key, fn):
+    """Return the cached result for key, or await fn() and cache its result if it succeeded."""
+    result = read_cache(key)
+    if result is not None:
+        return result
+ 
+    result = await fn()
+    if result is not None:
+        write_cache(key, result)
+    return result
+ 
+ 
+async def extract_menu_to_json(file_path):
+    # Cache hits skip base64 encoding, the network call and JSON repair entirely
+    async def request():
+        data_url = encode_image_data_url(file_path, guess_mime_type(file_path))
+        return await request_menu_json(build_request(file_path, data_url))
+ 
+    return await cached_call(cache_key(hash_file(file_path)), request)
+ 
+ 
+async def extract_menu_from_bytes(image_bytes, mime_type):
+    """Same as extract_menu_to_json, for a page image already in memory."""
+    async def request():
+        data_url = f"data:{mime_type};base64," + b64encode_str(image_bytes)
+        return await request_menu_json(build_request("page", data_url))
+ 
+    return await cached_call(page_cache_key(image_bytes), request)
+ 
+ 
+async def extract_menu_from_pages(pages, mime_type):
+    """
+    Extract several in-memory pages with a single Groq request.
+ 
+    Returns one menu data dict (or None) per page, in order. Each page's result
+    is cached under its own key, built from MULTI_PAGE_PROMPT so it is never
+    served as a single-page answer. If the reply does not hold one object per
+    image, the pages are extracted one by one instead; if the request itself
+    fails, every page is reported as failed.
+    """
+    if len(pages) == 1:
+        return [await extract_menu_from_bytes(pages[0], mime_type)]
+ 
+    data_urls = [f"data:{mime_type};base64," + b64encode_str(page) for page in pages]
+    request = build_request("pages", *data_urls, prompt=MULTI_PAGE_PROMPT)
+    try:
+        chat_completion = await create_completion_with_retry(**request["body"])
     except Exception as e:
+        # Retries are already spent; re-sending page by page would only add load
         print(f"API Error: {e}")
+        return [None] * len(pages)
+ 
+    results = parse_menu_response(chat_completion.choices[0].message.content)
+    if not (isinstance(results, list) and len(results) == len(pages) and all(isinstance(r, dict) for r in results)):
+        print(f"⚠ Reply did not match the {len(pages)} pages sent, extracting them one by one...")
+        return await asyncio.gather(*(extract_menu_from_bytes(page, mime_type) for page in pages))
+ 
+    for page, result in zip(pages, results):
+        write_cache(page_cache_key(page, MULTI_PAGE_PROMPT), result)
+    return results
+ 
+ 
+async def request_menu_json(request):
+    try:
+        chat_completion = await create_completion_with_retry(**request["body"])
+    except Exception as e:
+        print(f"API Error: {e}")
+        return None
+ 
+    return parse_menu_response(chat_completion.choices[0].message.content)
+ 
+ 
+def pdf_page_count(pdf_path):
+    if fitz is not None:
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+    from pdf2image import pdfinfo_from_path
+    return pdfinfo_from_path(pdf_path)["Pages"]
+ 
+ 
+def render_pdf_page(pdf_path, page_num, dpi=200, max_edge=1600):
+    """Render one PDF page to downscaled JPEG bytes."""
+    if fitz is not None:
+        with fitz.open(pdf_path) as doc:
+            page = doc[page_num - 1]
+            # Render straight at the capped size instead of downscaling afterwards
+            zoom = min(dpi / 72, max_edge / max(page.rect.width, page.rect.height))
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            return pix.tobytes("jpeg", jpg_quality=85)
+ 
+    from pdf2image import convert_from_path
+    img = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)[0]
+    buffer = io.BytesIO()
+    _save_page(img, buffer, max_edge)
+    return buffer.getvalue()
+ 
+ 
+async def extract_pdf_pipelined(pdf_path):
+    """
+    Render and extract a PDF at the same time: pages are rasterized in a
+    process pool and each group is sent to Groq as soon as it is rendered.
+    Pages stay in memory (no temp image files).
+ 
+    Identical pages (blank spacers, repeated banners) share one Groq call.
+    Pages are sent in fixed groups of PAGES_PER_REQUEST consecutive pages,
+    skipping pages that are already cached, so reruns find the same cache
+    entries whatever order the pages finish rendering in.
+ 
+    Returns one result per page, in page order (an exception for pages that failed).
+    """
+    try:
+        num_pages = await asyncio.to_thread(pdf_page_count, pdf_path)
+    except ImportError:
+        print("PyMuPDF or pdf2image not installed. Run: pip install pymupdf")
+        return []
+    except Exception as e:
+        print(f"Error converting PDF: {e}")
+        return []
+ 
+    print(f"Rendering {num_pages} page(s)...")
+    loop = asyncio.get_running_loop()
+    page_nums = list(range(1, num_pages + 1))
+    results = {page_num: loop.create_future() for page_num in page_nums}
+    first_copy = {}  # duplicate page number -> first page with the same image
+    # Answers are cached per prompt, so look pages up under the one this run sends
+    prompt = MULTI_PAGE_PROMPT if PAGES_PER_REQUEST > 1 else MENU_PROMPT
+ 
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, num_pages or 1)) as executor:
+        async def render(page_num):
+            image_bytes = await loop.run_in_executor(executor, render_pdf_page, pdf_path, page_num)
+            return image_bytes, page_digest(image_bytes)
+ 
+        renders = [asyncio.create_task(render(page_num)) for page_num in page_nums]
+ 
+        async def extract_group(group):
+            try:
+                # Wait for earlier pages too, so a duplicate is always matched to
+                # its first occurrence whichever render finishes first
+                rendered = await asyncio.gather(*renders[:group[-1]], return_exceptions=True)
+                first_page = {}  # digest -> first page number with that image
+                for page_num, page in enumerate(rendered, 1):
+                    if not isinstance(page, Exception):
+                        first_page.setdefault(page[1], page_num)
+ 
+                to_send = []
+                for page_num in group:
+                    page = rendered[page_num - 1]
+                    if isinstance(page, Exception):
+                        results[page_num].set_exception(page)
+                        continue
+                    image_bytes, digest = page
+                    if first_page[digest] != page_num:
+                        print(f"Page {page_num} is a duplicate of page {first_page[digest]}, reusing its result")
+                        first_copy[page_num] = first_page[digest]
+                        continue
+                    cached = read_cache(page_cache_key(image_bytes, prompt))
+                    if cached is not None:
+                        results[page_num].set_result(cached)
+                    else:
+                        to_send.append((page_num, image_bytes))
+ 
+                if to_send:
+                    print(f"Extracting page(s) {', '.join(str(page_num) for page_num, _ in to_send)}...")
+                    extracted = await extract_menu_from_pages([image_bytes for _, image_bytes in to_send], "image/jpeg")
+                    for (page_num, _), result in zip(to_send, extracted):
+                        results[page_num].set_result(result)
+            except Exception as e:
+                for page_num in group:
+                    if page_num not in first_copy and not results[page_num].done():
+                        results[page_num].set_exception(e)
+ 
+        await asyncio.gather(*(
+            extract_group(page_nums[i:i + PAGES_PER_REQUEST])
+            for i in range(0, num_pages, PAGES_PER_REQUEST)
+        ))
+ 
+        return await asyncio.gather(
+            *(results[first_copy.get(page_num, page_num)] for page_num in page_nums),
+            return_exceptions=True,
+        )
+ 
+ 
+def submit_batch(file_paths, groq_api_key):
+    """
+    Extract all pages through a single Groq batch job.
+ 
+    Returns a list of menu data in the same order as file_paths, or None if
+    the batch could not be run (callers then fall back to per-page requests).
+    """
+    batch_client = Groq(api_key=groq_api_key)
+ 
+    try:
+        with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as f:
+            for path in file_paths:
+                write_batch_line(f, path, path)
+            batch_input_path = f.name
+ 
+        try:
+            with open(batch_input_path, "rb") as f:
+                batch_file = batch_client.files.create(file=f, purpose="batch")
+        finally:
+            os.remove(batch_input_path)
+ 
+        batch = batch_client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        print(f"Submitted batch {batch.id} with {len(file_paths)} page(s)")
+ 
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(BATCH_POLL_SECONDS)
+            batch = batch_client.batches.retrieve(batch.id)
+            print(f"Batch status: {batch.status}")
+ 
+        if batch.status != "completed" or not batch.output_file_id:
+            print(f"✗ Batch ended with status '{batch.status}'")
+            return None
+ 
+        output = batch_client.files.content(batch.output_file_id).text()
+    except Exception as e:
+        print(f"Batch API Error: {e}")
         return None
  
+    responses = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        result = loads_json(line)
+        response = result.get("response") or {}
+        if response.get("status_code") == 200:
+            responses[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        else:
+            print(f"✗ Batch request failed for {result['custom_id']}: {result.get('error')}")
+ 
+    return [
+        parse_menu_response(responses[path]) if path in responses else None
+        for path in file_paths
+    ]
+ 
  
 def save_menu_json(menu_data, input_path, output_filename=None):
     input_dir = os.path.dirname(input_path) or "."
@@ -142,8 +639,8 @@ def save_menu_json(menu_data, input_path, output_filename=None):
  
     output_path = os.path.join(input_dir, output_filename)
  
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(menu_data, f, indent=2, ensure_ascii=False)
+    with open(output_path, "wb") as f:
+        f.write(dumps_json(menu_data, indent=True))
  
     print(f"Saved JSON to {output_path}")
     return output_path
@@ -157,35 +654,50 @@ if __name__ == "__main__":
         exit(1)
  
     print(f"Found: {menu_file}")
- 
-    if menu_file.lower().endswith(".pdf"):
-        FILE_PATHS = convert_pdf_to_image(menu_file)  # Now returns list
-        if not FILE_PATHS:
-            exit(1)
-    else:
-        FILE_PATHS = [menu_file]
+    is_pdf = menu_file.lower().endswith(".pdf")
  
     print("Extracting menu data...")
     
-    all_categories = []
     restaurant_name = None
     phone = None
  
-    for i, path in enumerate(FILE_PATHS, 1):
-        print(f"\n{'='*50}")
-        print(f"Processing page {i}/{len(FILE_PATHS)}...")
-        print(f"{'='*50}")
-        menu_data = extract_menu_to_json(path, GROQ_API_KEY)
-        
-        if menu_data:
+    page_results = None
+    if USE_GROQ_BATCH:
+        FILE_PATHS = convert_pdf_to_image(menu_file) if is_pdf else [menu_file]
+        if FILE_PATHS:
+            page_results = submit_batch(FILE_PATHS, GROQ_API_KEY)
+        if page_results is None:
+            print("Falling back to per-page requests...")
+ 
+    if page_results is None:
+        if is_pdf:
+            # Render pages and send them to Groq concurrently, in memory. Each
+            # successful page is cached under its own key as soon as it finishes
+            # (also when sent in a multi-page group), so rerunning after a crash
+            # only re-extracts the missing pages. The batch path above has no cache.
+            page_results = asyncio.run(extract_pdf_pipelined(menu_file))
+        else:
+            page_results = [asyncio.run(extract_menu_to_json(menu_file))]
+ 
+    for i, menu_data in enumerate(page_results, 1):
+        if isinstance(menu_data, Exception):
+            print(f"✗ Error on page {i}/{len(page_results)}: {menu_data}")
+        elif menu_data:
             if not restaurant_name:
                 restaurant_name = menu_data.get("restaurant_name")
             if not phone:
                 phone = menu_data.get("phone")
-            all_categories.extend(menu_data.get("categories", []))
-            print(f"✓ Successfully extracted {len(menu_data.get('categories', []))} categories from page {i}")
+            print(f"✓ Successfully extracted {len(menu_data.get('categories', []))} categories from page {i}/{len(page_results)}")
         else:
-            print(f"✗ Failed to extract data from page {i}")
+            print(f"✗ Failed to extract data from page {i}/{len(page_results)}")
+ 
+    # gather returns pages in order, so flatten the successful ones in one pass
+    all_categories = [
+        category
+        for menu_data in page_results
+        if menu_data and not isinstance(menu_data, Exception)
+        for category in menu_data.get("categories", [])
+    ]
     
     combined_menu = {
         "restaurant_name": restaurant_name,
@@ -198,7 +710,7 @@ if __name__ == "__main__":
         print("EXTRACTION COMPLETE")
         print("="*50)
         print("Extracted Menu Data:")
-        print(json.dumps(combined_menu, indent=2, ensure_ascii=False))
+        print(dumps_json(combined_menu, indent=True).decode("utf-8"))
  
         save_menu_json(combined_menu, menu_file)
  
@@ -206,7 +718,7 @@ if __name__ == "__main__":
         print("\n" + "="*50)
         print("SUMMARY")
         print("="*50)
-        print(f"Pages Processed: {len(FILE_PATHS)}")
+        print(f"Pages Processed: {len(page_results)}")
         print(f"Categories Extracted: {len(combined_menu.get('categories', []))}")
         print(f"Total Items: {total_items}")
     else:
@@ -1,11 +1,45 @@
+import asyncio
 import base64
+import hashlib
 import json
+import mimetypes
 import os
+import random
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from io import BytesIO
+from itertools import repeat
 from pathlib import Path
-from groq import Groq
+from groq import AsyncGroq, APIStatusError
 from dotenv import load_dotenv
 
+try:
+    import fitz  # PyMuPDF renders pages in-process, no poppler subprocess or PPM temp files
+except ImportError:
+    fitz = None
+
+try:
+    import orjson  # SIMD JSON parsing and serialization; stdlib json is the fallback
+except ImportError:
+    orjson = None
+
+try:
+    import pybase64  # SIMD base64 that returns str directly
+except ImportError:
+    pybase64 = None
+
+try:
+    from aiolimiter import AsyncLimiter
+except ImportError:
+    AsyncLimiter = None
+
+try:
+    import xxhash  # Much faster than blake2b for spotting duplicate pages
+except ImportError:
+    xxhash = None
+
 # Load environment variables
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -13,95 +47,218 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found. Add it to your .env file.")
 
-SUPPORTED_EXT = [".pdf", ".jpg", ".jpeg", ".png"]
+SUPPORTED_EXT = (".pdf", ".jpg", ".jpeg", ".png")  # Tuple so str.endswith can check them all at once
+MAX_CONCURRENT_REQUESTS = 8  # In-flight Groq calls across all pages
+MAX_CONCURRENT_BATCHES = 4  # Batches probed at once for a single image
+MAX_ATTEMPTS = 3  # Attempts per request on 429 / 5xx responses
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))  # Requests per minute allowed for MODEL_NAME on this account
+MODEL_NAME = "meta-llama/llama-4-maverick-17b-128e-instruct"
+TEMPERATURE = 0.2
+MAX_TOKENS = 2000
+
+# Markdown code fences the model sometimes wraps its JSON in
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+
+# Extracted items per image, keyed on image bytes + prompt + model settings
+CACHE_DIR = Path(".cache/groq_items")
+
+COMMON_RULES = """
+You extract menu items from an image.
+
+Rules:
+1. NEVER merge items.
+2. One price = one item.
+3. If a name has multiple prices, split them into separate items.
+4. If a line contains multiple menu entries, split them.
+5. Ignore noise, ads, contact info.
+6. Output ONLY a JSON array of:
+   { "name": "string", "price": number }
+"""
+
+# One async client shared by every request
+client = AsyncGroq(api_key=GROQ_API_KEY)
+request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+# Token bucket on request starts, so bursts never trip the per-minute limit (no-op without aiolimiter)
+rate_limiter = AsyncLimiter(GROQ_RPM, 60) if AsyncLimiter is not None else nullcontext()
+
+
+async def create_completion_with_retry(**kwargs):
+    # Back off exponentially, with jitter, on rate limits and server errors
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            async with rate_limiter, request_slots:
+                return await client.chat.completions.create(**kwargs)
+        except APIStatusError as e:
+            retryable = e.status_code == 429 or e.status_code >= 500
+            if not retryable or attempt == MAX_ATTEMPTS:
+                raise
+            delay = 2 ** attempt + random.uniform(0, 1)
+            print(f"Groq returned {e.status_code}, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
 
 
 # -------------------------------------------------------------------
 # NEW: Convert PDF → images in memory (NO SAVE TO DISK)
 # -------------------------------------------------------------------
-def pdf_to_images_in_memory(pdf_path):
+def _render_page(pdf_path, page_num):
+    # Runs in a worker process; each worker opens its own copy of the PDF
+    if fitz is not None:
+        # Pixmaps encode straight to JPEG bytes, no PIL round-trip
+        with fitz.open(pdf_path) as doc:
+            return doc[page_num - 1].get_pixmap(dpi=300).tobytes("jpeg", jpg_quality=80)
+
     from pdf2image import convert_from_path
-    print("Converting PDF to in-memory images...")
+    img = convert_from_path(pdf_path, dpi=300, first_page=page_num, last_page=page_num)[0]
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
 
-    pil_images = convert_from_path(pdf_path, dpi=300)
-    image_bytes_list = []
 
-    for img in pil_images:
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        image_bytes_list.append(buffer.read())
+def pdf_to_images_in_memory(pdf_path):
+    print("Converting PDF to in-memory images...")
+
+    if fitz is not None:
+        with fitz.open(pdf_path) as doc:
+            num_pages = doc.page_count
+    else:
+        from pdf2image import pdfinfo_from_path
+        num_pages = pdfinfo_from_path(pdf_path)["Pages"]
+
+    # Pages are independent, so rasterize them on every core
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, num_pages or 1)) as executor:
+        image_bytes_list = list(
+            executor.map(_render_page, repeat(pdf_path), range(1, num_pages + 1))
+        )
 
     print(f"Loaded {len(image_bytes_list)} page(s) in memory")
     return image_bytes_list
 
 
 # -------------------------------------------------------------------
-# Batch-safe menu extraction for each image
+# JSON helpers: orjson when installed, stdlib json otherwise
 # -------------------------------------------------------------------
-def extract_menu_from_image_bytes(image_bytes, groq_api_key, max_batches=20):
-    client = Groq(api_key=groq_api_key)
+def loads_json(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
 
-    encoded_image = base64.b64encode(image_bytes).decode("utf-8")
 
-    common_rules = """
-You extract menu items from an image.
+def dumps_json(data, indent=False):
+    # Always returns UTF-8 bytes
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
 
-Rules:
-1. NEVER merge items.
-2. One price = one item.
-3. If a name has multiple prices, split them into separate items.
-4. If a line contains multiple menu entries, split them.
-5. Ignore noise, ads, contact info.
-6. Output ONLY a JSON array of:
-   { "name": "string", "price": number }
-"""
 
-    all_items = []
+# -------------------------------------------------------------------
+# Cache extracted items by image content, so reruns skip Groq entirely
+# -------------------------------------------------------------------
+def cache_path(image_bytes, max_batches):
+    settings = f"{MODEL_NAME}\n{COMMON_RULES}\n{TEMPERATURE}\n{MAX_TOKENS}\n{max_batches}".encode("utf-8")
+    key = hashlib.blake2b(image_bytes).hexdigest() + "-" + hashlib.blake2b(settings).hexdigest()[:16]
+    return CACHE_DIR / key[:2] / key
+
+
+def save_cached_items(path, items):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so concurrent pages never see a half-written entry
+    with tempfile.NamedTemporaryFile("wb", dir=path.parent, delete=False) as f:
+        f.write(dumps_json(items))
+    os.replace(f.name, path)
 
-    for batch_num in range(1, max_batches + 1):
+
+# -------------------------------------------------------------------
+# Batch-safe menu extraction for each image
+# -------------------------------------------------------------------
+async def extract_menu_from_image_bytes(image_bytes, max_batches=20, mime_type="image/jpeg"):
+    cached = cache_path(image_bytes, max_batches)
+    if cached.exists():
+        return loads_json(cached.read_bytes())
+
+    if pybase64 is not None:
+        encoded_image = pybase64.b64encode_as_string(image_bytes)
+    else:
+        encoded_image = base64.b64encode(image_bytes).decode("ascii")
+
+    # The image part is identical for every batch; build it once
+    image_part = {
+        "type": "image_url",
+        "image_url": {"url": f"data:{mime_type};base64,{encoded_image}"},
+    }
+
+    batch_slots = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+
+    async def extract_batch(batch_num):
         prompt = f"""
-{common_rules}
+{COMMON_RULES}
 
 Extract batch #{batch_num}.
 If no more items remain in the image, return [].
 Return ONLY JSON array.
 """
 
-        resp = client.chat.completions.create(
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-            temperature=0.2,
-            max_tokens=2000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{encoded_image}"
-                            },
-                        },
-                    ],
-                }
-            ],
-        )
-
-        raw = resp.choices[0].message.content.strip()
-        raw = raw.replace("```json", "").replace("```", "").strip()
+        async with batch_slots:
+            resp = await create_completion_with_retry(
+                model=MODEL_NAME,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            image_part,
+                        ],
+                    }
+                ],
+            )
+
+        raw = _FENCE_RE.sub("", resp.choices[0].message.content.strip()).strip()
 
         try:
-            batch_items = json.loads(raw)
+            return loads_json(raw)
         except Exception:
             print(f"Batch {batch_num} returned invalid JSON. Skipping.")
-            continue
-
-        if not batch_items:
-            break  # no more data
+            return None
+
+    # Launch every batch up front; the semaphore keeps only a few in flight
+    tasks = {
+        asyncio.create_task(extract_batch(batch_num)): batch_num
+        for batch_num in range(1, max_batches + 1)
+    }
+    results = {}
+    last_batch = max_batches + 1  # first batch that came back empty
+    pending = set(tasks)
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                batch_num = tasks[task]
+                batch_items = task.result()
+                results[batch_num] = batch_items
+                if batch_items is not None and not batch_items:
+                    last_batch = min(last_batch, batch_num)  # no more data
+
+            # Batches past the first empty one are not needed any more
+            for task in pending:
+                if tasks[task] > last_batch:
+                    task.cancel()
+            pending = {task for task in pending if tasks[task] < last_batch}
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-        all_items.extend(batch_items)
+    all_items = []
+    for batch_num in range(1, last_batch):
+        if results.get(batch_num):
+            all_items.extend(results[batch_num])
 
+    if all_items:
+        save_cached_items(cached, all_items)
     return all_items
 
 
@@ -116,8 +273,8 @@ def save_menu_json(menu_data, input_path, output_filename=None):
 
     output_path = os.path.join(folder, output_filename)
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(menu_data, f, indent=2, ensure_ascii=False)
+    with open(output_path, "wb") as f:
+        f.write(dumps_json(menu_data, indent=True))
 
     print(f"Saved JSON → {output_path}")
     return output_path
@@ -130,12 +287,13 @@ def get_menu_files_from_folder(folder="menu"):
     if not os.path.exists(folder):
         raise ValueError(f"Menu folder not found: {folder}")
 
-    files = []
-    for f in os.listdir(folder):
-        path = os.path.join(folder, f)
-        ext = os.path.splitext(f)[1].lower()
-        if ext in SUPPORTED_EXT:
-            files.append(path)
+    # scandir entries carry the name, path and file type from the directory listing
+    with os.scandir(folder) as entries:
+        files = [
+            entry.path
+            for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXT)
+        ]
 
     if not files:
         raise ValueError("No supported menu files found in /menu folder.")
@@ -143,10 +301,37 @@ def get_menu_files_from_folder(folder="menu"):
     return files
 
 
+# -------------------------------------------------------------------
+# Extract all pages concurrently
+# -------------------------------------------------------------------
+def page_digest(image_bytes):
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(image_bytes)
+    return hashlib.blake2b(image_bytes, digest_size=16).digest()
+
+
+async def extract_pages(images_bytes, mime_type="image/jpeg"):
+    # Identical pages (blank spacers, repeated banners) share one extraction
+    digests = [page_digest(img_bytes) for img_bytes in images_bytes]
+    unique_pages = dict(zip(digests, images_bytes))
+    if len(unique_pages) < len(images_bytes):
+        print(f"Skipping {len(images_bytes) - len(unique_pages)} duplicate page(s)")
+
+    tasks = [
+        extract_menu_from_image_bytes(img_bytes, mime_type=mime_type)
+        for img_bytes in unique_pages.values()
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Map back to page order, duplicates included
+    by_digest = dict(zip(unique_pages, results))
+    return [by_digest[digest] for digest in digests]
+
+
 # -------------------------------------------------------------------
 # Main Script
 # -------------------------------------------------------------------
-if __name__ == "__main__":
+async def main():
 
     menu_files = get_menu_files_from_folder("menu")
     print(f"Found {len(menu_files)} menu file(s).\n")
@@ -159,22 +344,30 @@ if __name__ == "__main__":
 
         # Convert PDF to images in memory OR load image directly
         if menu_file.lower().endswith(".pdf"):
-            images_bytes = pdf_to_images_in_memory(menu_file)
+            images_bytes = await asyncio.to_thread(pdf_to_images_in_memory, menu_file)
+            mime_type = "image/jpeg"
         else:
             with open(menu_file, "rb") as f:
                 images_bytes = [f.read()]
+            mime_type = mimetypes.guess_type(menu_file)[0] or "image/jpeg"
 
-        all_items = []
-
-        for idx, img_bytes in enumerate(images_bytes, 1):
-            print(f"\nExtracting page {idx}/{len(images_bytes)}...")
-            page_items = extract_menu_from_image_bytes(img_bytes, GROQ_API_KEY)
+        print(f"\nExtracting {len(images_bytes)} page(s)...")
+        page_results = await extract_pages(images_bytes, mime_type)
 
-            if page_items:
-                all_items.extend(page_items)
-            else:
+        for idx, page_items in enumerate(page_results, 1):
+            if isinstance(page_items, Exception):
+                print(f"✗ Error on page {idx}: {page_items}")
+            elif not page_items:
                 print(f"✗ No data extracted from page {idx}")
 
+        # gather returns pages in order, so flatten the successful ones in one pass
+        all_items = [
+            item
+            for page_items in page_results
+            if page_items and not isinstance(page_items, Exception)
+            for item in page_items
+        ]
+
         final_json = {
             "restaurant_name": None,
             "phone": None,
@@ -184,3 +377,7 @@ if __name__ == "__main__":
         }
 
         save_menu_json(final_json, menu_file)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,9 +2,13 @@
 Simple PDF/Image Text Extraction Bot
 Extracts text from PDFs and JPEG images, creates JSON output using Groq LLM.
 """
+import io
 import os
+import re
 import json
 import PyPDF2
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from datetime import datetime
 from groq import Groq
@@ -12,9 +16,40 @@ from dotenv import load_dotenv
 from PIL import Image
 import pytesseract
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import fitz  # PyMuPDF: much faster text extraction than PyPDF2
+except ImportError:
+    fitz = None
+
 # Load environment variables
 load_dotenv()
 
+# Patterns used by preprocess_menu_text, compiled once at import
+# Matches phone numbers like: +91 1234567890, 123-456-7890, (123) 456-7890
+PHONE_RE = re.compile(r'[\+\(]?\d{1,4}[\)\-\s]?\d{3,4}[\-\s]?\d{3,4}[\-\s]?\d{3,4}')
+EMAIL_RE = re.compile(r'\S+@\S+\.\S+')
+URL_RE = re.compile(r'http[s]?://\S+|www\.\S+')
+SPACES_RE = re.compile(r' +')
+BLANK_LINES_RE = re.compile(r'\n\s*\n')
+
+PAGE_BREAK = "\n\n--- PAGE BREAK ---\n\n"
+TESSERACT_CONFIG = "--oem 1 --psm 6"  # LSTM engine, page read as one uniform block of menu lines
+
+MENU_KEYWORDS = ["menu", "appetizer", "entree", "dessert", "price", "$", "₹"]
+
+# One automaton finds any keyword in a single pass over the text
+MENU_KEYWORD_AUTOMATON = None
+if ahocorasick is not None:
+    MENU_KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for keyword in MENU_KEYWORDS:
+        MENU_KEYWORD_AUTOMATON.add_word(keyword, keyword)
+    MENU_KEYWORD_AUTOMATON.make_automaton()
+
 
 def extract_text_from_image(image_path):
     """Extract text from JPEG/PNG image using OCR."""
@@ -23,7 +58,7 @@ def extract_text_from_image(image_path):
         image = Image.open(image_path)
         
         # Perform OCR
-        text = pytesseract.image_to_string(image)
+        text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
         
         if text.strip():
             print(f"Extracted text from image using OCR")
@@ -39,65 +74,112 @@ def extract_text_from_image(image_path):
 
 def preprocess_menu_text(text):
     """Clean and preprocess extracted menu text for better LLM processing."""
-    import re
-    
     cleaned_text = text
     
     # Remove phone numbers (common pattern in menus)
-    # Matches patterns like: +91 1234567890, 123-456-7890, (123) 456-7890
-    cleaned_text = re.sub(r'[\+\(]?\d{1,4}[\)\-\s]?\d{3,4}[\-\s]?\d{3,4}[\-\s]?\d{3,4}', '', cleaned_text)
+    cleaned_text = PHONE_RE.sub('', cleaned_text)
     
     # Remove email addresses
-    cleaned_text = re.sub(r'\S+@\S+\.\S+', '', cleaned_text)
+    cleaned_text = EMAIL_RE.sub('', cleaned_text)
     
     # Remove URLs
-    cleaned_text = re.sub(r'http[s]?://\S+|www\.\S+', '', cleaned_text)
+    cleaned_text = URL_RE.sub('', cleaned_text)
     
     # Remove extra whitespace while preserving structure
-    cleaned_text = re.sub(r' +', ' ', cleaned_text)  # Multiple spaces to single space
-    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)  # Multiple newlines to double newline
+    cleaned_text = SPACES_RE.sub(' ', cleaned_text)  # Multiple spaces to single space
+    cleaned_text = BLANK_LINES_RE.sub('\n\n', cleaned_text)  # Multiple newlines to double newline
     
     return cleaned_text.strip()
 
 
+def looks_like_menu(text):
+    """Check whether text contains any menu keyword (case-insensitive)."""
+    lowered = text.lower()
+    if MENU_KEYWORD_AUTOMATON is not None:
+        return next(MENU_KEYWORD_AUTOMATON.iter(lowered), None) is not None
+    return any(keyword in lowered for keyword in MENU_KEYWORDS)
+
+
+def _limit_ocr_threads():
+    # Every worker runs its own Tesseract; cap its OpenMP threads so the
+    # workers together don't oversubscribe the CPU
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_page(pdf_path, page_num):
+    """Render and OCR one scanned PDF page (runs in a worker process)."""
+    with fitz.open(pdf_path) as doc:
+        pix = doc[page_num].get_pixmap(dpi=300)
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    return pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+
+
 def extract_text_from_pdf(pdf_path):
     """Extract text from all pages of a PDF file."""
     try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
+        if fitz is not None:
+            # Text-layer pages are read inline; get_text() takes milliseconds
+            with fitz.open(pdf_path) as doc:
+                page_texts = [page.get_text() for page in doc]
+
+            # Scanned pages (no text layer) need OCR, the slow part: spread them across cores
+            scanned = [page_num for page_num, text in enumerate(page_texts) if not text.strip()]
+            if scanned:
+                print(f"Running OCR on {len(scanned)} scanned page(s)...")
+                with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(scanned)),
+                                         initializer=_limit_ocr_threads) as executor:
+                    ocr_texts = executor.map(_ocr_page, repeat(pdf_path), scanned)
+                    for page_num, text in zip(scanned, ocr_texts):
+                        page_texts[page_num] = text
+
+            total_pages = len(page_texts)
+            text = PAGE_BREAK.join(page_texts)
+        else:
+            # Write pages straight into one buffer instead of keeping a list of them
+            buffer = io.StringIO()
+            with open(pdf_path, 'rb') as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                total_pages = len(pdf_reader.pages)
 
-            all_text = []
-            for page_num in range(total_pages):
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text()
-                all_text.append(text)
+                for page_num, page in enumerate(pdf_reader.pages):
+                    if page_num:
+                        buffer.write(PAGE_BREAK)
+                    buffer.write(page.extract_text() or "")
+            text = buffer.getvalue()
 
-            print(f"Extracted text from {total_pages} pages")
-            return "\n\n--- PAGE BREAK ---\n\n".join(all_text), total_pages
+        print(f"Extracted text from {total_pages} pages")
+        return text, total_pages
 
     except Exception as e:
         print(f"Error extracting text: {e}")
         return None, 0
 
 
+_client = None
+
+
+def get_client():
+    """Return the shared Groq client, creating it on first use so connections are reused."""
+    global _client
+    if _client is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+        _client = Groq(api_key=api_key)
+    return _client
+
+
 def process_with_llm(text, filename):
     """Use Groq LLM to structure the extracted text into JSON."""
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not found in environment variables")
+    client = get_client()
 
     # Load config from .env
     model = os.getenv("MODEL_NAME")
     temperature = float(os.getenv("TEMPERATURE", 0.3))
     max_tokens = int(os.getenv("MAX_TOKENS", 4000))
 
-    client = Groq(api_key=api_key)
-
     # Detect menu-type content
-    is_menu = any(keyword in text.lower() for keyword in [
-        "menu", "appetizer", "entree", "dessert", "price", "$", "₹"
-    ])
+    is_menu = looks_like_menu(text)
 
     if is_menu:
         system_prompt = """You are an expert at analyzing restaurant menus. Extract structured information accurately.